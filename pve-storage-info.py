@@ -25,54 +25,217 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import argparse
+import csv
+import functools
+import getpass
+import http.client
 import json
+import os
+import re
+import ssl
 import subprocess
 import sys
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from ipaddress import ip_address, AddressValueError
+from operator import itemgetter
+from urllib.parse import quote, urlencode
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 __version__ = "0.1.0b1"
 
+PVE_NODES_DIR = "/etc/pve/nodes"
+_CONF_DIRS = {"qemu": "qemu-server", "lxc": "lxc"}
+_PENDING_SECTIONS = ("[PENDING]", "[pve:pending]")
+
+_QEMU_DISK_KEY = re.compile(r"(?:scsi|ide|virtio|sata)\d+")
+_LXC_DISK_KEY = re.compile(r"rootfs|mp\d+")
+_SIZE_RE = re.compile(r"(?:^|,)size=([^,]+)")
+_CDROM_RE = re.compile(r"(?:^|,)media=cdrom(?:,|$)")
+
+if orjson is not None:
+    _loads = orjson.loads
+
+    def print_json(obj):
+        sys.stdout.write(
+            orjson.dumps(
+                obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+            ).decode()
+        )
+
+else:
+    _loads = json.loads
+    _json_encoder = json.JSONEncoder(indent=2)
+
+    # Stream chunks into stdout's buffer instead of building the whole
+    # document as one string first.
+    def print_json(obj):
+        write = sys.stdout.write
+        for chunk in _json_encoder.iterencode(obj):
+            write(chunk)
+        write("\n")
+
+# pvesh lost its interactive shell in PVE 5.3, so there is no long-lived
+# session to feed commands into: every call is a fresh Perl process. Use
+# --use-api (PveApiClient) to avoid the per-call startup cost.
 def run_pvesh(args_list):
     result = subprocess.run(
         ["pvesh"] + args_list,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
         check=True,
     )
     if not result.stdout.strip():
         return None
-    return json.loads(result.stdout)
+    return _loads(result.stdout)
+
+
+class PveError(Exception):
+    pass
+
+
+# Each worker thread keeps its own keep-alive HTTPS connection, so TLS and
+# auth are negotiated once per thread instead of once per request. Auth is
+# either an API token or a ticket obtained once via login().
+class PveApiClient:
+    def __init__(self, host, port=8006, token=None, verify_ssl=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.headers = {"Connection": "keep-alive"}
+        if token:
+            self.headers["Authorization"] = f"PVEAPIToken={token}"
+        if verify_ssl:
+            self.ssl_context = ssl.create_default_context()
+        else:
+            self.ssl_context = ssl._create_unverified_context()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, context=self.ssl_context, timeout=self.timeout
+            )
+            self._local.conn = conn
+        return conn
+
+    def _send(self, method, url, body, headers):
+        conn = self._connection()
+        conn.request(method, url, body=body, headers=headers)
+        resp = conn.getresponse()
+        return resp, resp.read()
+
+    def _request(self, method, url, body=None, headers=None):
+        headers = headers or self.headers
+        try:
+            return self._send(method, url, body, headers)
+        except (http.client.HTTPException, OSError):
+            # The server may have dropped an idle keep-alive connection.
+            self._local.conn.close()
+            self._local.conn = None
+            return self._send(method, url, body, headers)
+
+    def login(self, username, password):
+        body = urlencode({"username": username, "password": password})
+        headers = dict(self.headers)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            resp, data = self._request(
+                "POST", "/api2/json/access/ticket", body=body, headers=headers
+            )
+        except (http.client.HTTPException, OSError) as e:
+            raise PveError(f"login as {username}: {e}") from e
+        if resp.status != 200:
+            raise PveError(f"login as {username}: {resp.status} {resp.reason}")
+        ticket = (_loads(data).get("data") or {}).get("ticket")
+        if not ticket:
+            raise PveError(f"login as {username}: no ticket in response")
+        # GET requests only need the cookie; the CSRF token is for writes.
+        self.headers["Cookie"] = f"PVEAuthCookie={ticket}"
+
+    def get(self, path, **params):
+        url = "/api2/json" + quote(path)
+        if params:
+            url += "?" + urlencode(params)
+        try:
+            resp, body = self._request("GET", url)
+        except (http.client.HTTPException, OSError) as e:
+            raise PveError(f"GET {path}: {e}") from e
+        if resp.status != 200:
+            raise PveError(f"GET {path}: {resp.status} {resp.reason}")
+        return _loads(body).get("data")
+
+
+API_CLIENT = None
+_EXECUTOR = None
+
+
+# One pool for the whole run; the first caller decides its size.
+def _get_executor(workers):
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=max(1, workers))
+    return _EXECUTOR
+
+
+def _pve_get(path, params):
+    if API_CLIENT is not None:
+        return API_CLIENT.get(path, **params)
+    args_list = ["get", path]
+    for key, value in params.items():
+        args_list += [f"--{key}", str(value)]
+    args_list += ["--output-format", "json"]
+    try:
+        return run_pvesh(args_list)
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode(errors="replace").strip()
+        raise PveError(stderr or str(e)) from e
+
+
+@functools.lru_cache(maxsize=64)
+def _pve_get_cached(path, params):
+    return _pve_get(path, dict(params))
+
+
+# Results are memoized per process so repeated lookups of the same endpoint
+# (e.g. /nodes) don't pay for another pvesh spawn. Pass cache=False for
+# endpoints whose data changes between calls or that are read only once.
+# Cached results are shared: callers must not modify them.
+def pve_get(path, cache=True, **params):
+    if cache:
+        return _pve_get_cached(path, tuple(sorted(params.items())))
+    return _pve_get(path, params)
+
+
+_SIZE_UNIT_MB = {
+    "K": (1, 1024),
+    "M": (1, 1),
+    "G": (1024, 1),
+    "T": (1024 * 1024, 1),
+}
+_HUMAN_UNITS = ((1024 * 1024, "TiB"), (1024, "GiB"), (1, "MiB"))
 
 
 def parse_size_to_mb(size_str):
     if not size_str:
         return None
     unit = size_str[-1]
-    num_str = size_str[:-1]
     if unit.isdigit():
         try:
             return int(size_str)
         except ValueError:
             return None
-    if "." in num_str:
-        num_str = num_str.split(".", 1)[0]
     try:
-        num = int(num_str)
+        num = int(size_str[:-1].partition(".")[0])
     except ValueError:
         return None
-    unit = unit.upper()
-    if unit == "K":
-        return num // 1024
-    if unit == "M":
-        return num
-    if unit == "G":
-        return num * 1024
-    if unit == "T":
-        return num * 1024 * 1024
-    return num
+    mul, div = _SIZE_UNIT_MB.get(unit.upper(), (1, 1))
+    return num * mul // div
 
 
 def humanize_mb(mb):
@@ -80,16 +243,10 @@ def humanize_mb(mb):
         mb = int(mb)
     except (TypeError, ValueError):
         return str(mb)
-    if mb >= 1024 * 1024:
-        val = mb / (1024 * 1024)
-        unit = "TiB"
-    elif mb >= 1024:
-        val = mb / 1024
-        unit = "GiB"
-    else:
-        val = mb
-        unit = "MiB"
-    return f"{mb} ({val:.2f} {unit})"
+    for threshold, unit in _HUMAN_UNITS:
+        if mb >= threshold:
+            break
+    return f"{mb} ({mb / threshold:.2f} {unit})"
 
 
 def is_mb_column(col_name):
@@ -97,27 +254,57 @@ def is_mb_column(col_name):
 
 
 def print_table(headers, rows, human=False):
+    humanize = [human and is_mb_column(col) for col in headers]
+    widths = [len(h) for h in headers]
     str_rows = []
     for row in rows:
         line = []
-        for col in headers:
+        for i, col in enumerate(headers):
             val = row.get(col, "")
-            if human and is_mb_column(col) and isinstance(val, (int, float)):
+            if humanize[i] and isinstance(val, (int, float)):
                 val_str = humanize_mb(val)
             else:
                 val_str = str(val)
+            if len(val_str) > widths[i]:
+                widths[i] = len(val_str)
             line.append(val_str)
         str_rows.append(line)
-    widths = [len(h) for h in headers]
-    for line in str_rows:
-        for i, cell in enumerate(line):
-            widths[i] = max(widths[i], len(cell))
-    header_line = "  ".join(h.ljust(widths[i]) for i, h in enumerate(headers))
-    sep_line = "  ".join("-" * widths[i] for i in range(len(headers)))
-    print(header_line)
-    print(sep_line)
-    for line in str_rows:
-        print("  ".join(line[i].ljust(widths[i]) for i in range(len(headers))))
+    out = [
+        "  ".join(h.ljust(widths[i]) for i, h in enumerate(headers)),
+        "  ".join("-" * w for w in widths),
+    ]
+    out.extend(
+        "  ".join(cell.ljust(w) for cell, w in zip(line, widths)) for line in str_rows
+    )
+    sys.stdout.write("\n".join(out) + "\n")
+
+
+def print_csv(headers, rows, header=True):
+    writer = csv.writer(sys.stdout, delimiter=";", lineterminator="\n")
+    if header:
+        writer.writerow(headers)
+    writer.writerows([r[h] for h in headers] for r in rows)
+
+
+# Sums size_mb over rows grouped by key_fields in a single pass. The other
+# output columns are taken from the first row of each group; groups keep
+# first-seen order.
+def sum_by(rows, columns, key_fields, total_field):
+    get_key = itemgetter(*key_fields)
+    groups = {}
+    for r in rows:
+        key = get_key(r)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [r, r["size_mb"]]
+        else:
+            group[1] += r["size_mb"]
+    result = []
+    for first, total in groups.values():
+        out = {c: first[c] for c in columns}
+        out[total_field] = total
+        result.append(out)
+    return result
 
 
 def extract_disk_info(cluster_name, node, vmid, vmname, bus, diskspec):
@@ -125,15 +312,10 @@ def extract_disk_info(cluster_name, node, vmid, vmname, bus, diskspec):
         return None
     storage, rest = diskspec.split(":", 1)
     vmdisk = rest.split(",", 1)[0]
-    pos = diskspec.rfind("size=")
-    if pos == -1:
+    m = _SIZE_RE.search(diskspec)
+    if m is None:
         return None
-    size_part = diskspec[pos + 5 :]
-    if "," in size_part:
-        size = size_part.split(",", 1)[0]
-    else:
-        size = size_part
-    size = size.strip()
+    size = m.group(1).strip()
     if not size:
         return None
     size_mb = parse_size_to_mb(size)
@@ -143,6 +325,7 @@ def extract_disk_info(cluster_name, node, vmid, vmname, bus, diskspec):
         "cluster": cluster_name,
         "node": node,
         "vmid": str(vmid),
+        "vmid_int": int(vmid),
         "vmname": vmname,
         "storage": storage,
         "vmdisk": vmdisk,
@@ -151,86 +334,166 @@ def extract_disk_info(cluster_name, node, vmid, vmname, bus, diskspec):
     }
 
 
+# Reads a guest config straight from the cluster filesystem (pmxcfs), which
+# every cluster member mounts at /etc/pve. Pending changes are applied the
+# same way GET /nodes/{node}/{type}/{vmid}/config does; snapshot sections
+# are skipped. Raises OSError if the file is not available.
+def read_vm_config(node, vtype, vmid):
+    path = f"{PVE_NODES_DIR}/{node}/{_CONF_DIRS[vtype]}/{vmid}.conf"
+    cfg = {}
+    pending = {}
+    target = cfg
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped[0] == "#":
+                continue
+            if stripped[0] == "[":
+                target = pending if stripped in _PENDING_SECTIONS else None
+                continue
+            if target is None:
+                continue
+            key, sep, val = stripped.partition(":")
+            if sep:
+                target[key] = val.strip()
+    deletes = pending.pop("delete", "")
+    cfg.update(pending)
+    for opt in deletes.split(","):
+        cfg.pop(opt.strip().lstrip("!"), None)
+    return cfg
+
+
+# /etc/pve only describes the local cluster, so it is skipped in API mode
+# where --api-host may point elsewhere.
+def get_vm_config(node, vtype, vmid):
+    if API_CLIENT is None:
+        try:
+            return read_vm_config(node, vtype, vmid)
+        except OSError:
+            pass
+    return pve_get(f"/nodes/{node}/{vtype}/{vmid}/config", cache=False)
+
+
 def fetch_vm_disks(cluster_name, vm_entry):
     vmid = vm_entry["vmid"]
     node = vm_entry["node"]
     vmname = vm_entry["vmname"]
     vtype = vm_entry["type"]
+    if vtype not in ("qemu", "lxc"):
+        return []
     try:
-        if vtype == "qemu":
-            cfg = run_pvesh(
-                [
-                    "get",
-                    f"/nodes/{node}/qemu/{vmid}/config",
-                    "--output-format",
-                    "json",
-                ]
-            )
-        elif vtype == "lxc":
-            cfg = run_pvesh(
-                ["get", f"/nodes/{node}/lxc/{vmid}/config", "--output-format", "json"]
-            )
-        else:
-            return []
-    except subprocess.CalledProcessError as e:
+        cfg = get_vm_config(node, vtype, vmid)
+    except PveError as e:
         sys.stderr.write(
-            f"Warning: cannot get config for {vtype} {vmid} on {node}: {e.stderr}\n"
+            f"Warning: cannot get config for {vtype} {vmid} on {node}: {e}\n"
         )
         return []
     if not cfg:
         return []
     rows = []
+    is_disk_key = (_QEMU_DISK_KEY if vtype == "qemu" else _LXC_DISK_KEY).fullmatch
     for key, value in cfg.items():
+        if not is_disk_key(key):
+            continue
         value_str = str(value)
-        if vtype == "qemu":
-            if not (
-                key.startswith("scsi")
-                or key.startswith("ide")
-                or key.startswith("virtio")
-                or key.startswith("sata")
-            ):
-                continue
-            if "media=cdrom" in value_str:
-                continue
-        elif vtype == "lxc":
-            if not (key == "rootfs" or key.startswith("mp")):
-                continue
+        if vtype == "qemu" and _CDROM_RE.search(value_str):
+            continue
         info = extract_disk_info(cluster_name, node, vmid, vmname, key, value_str)
         if info:
             rows.append(info)
     return rows
 
 
+def safe_fetch_vm_disks(cluster_name, vm_entry):
+    try:
+        return fetch_vm_disks(cluster_name, vm_entry)
+    except Exception as e:
+        sys.stderr.write(
+            f"Error processing {vm_entry['type']} {vm_entry['vmid']} on {vm_entry['node']}: {e}\n"
+        )
+        return []
+
+
+def fetch_node_storages(node_name):
+    try:
+        stor_list = pve_get(f"/nodes/{node_name}/storage")
+    except PveError as e:
+        sys.stderr.write(
+            f"Warning: cannot get storage list for node {node_name}: {e}\n"
+        )
+        return []
+    tasks = []
+    for s in stor_list or []:
+        storage_id = s.get("storage")
+        if not storage_id:
+            continue
+        tasks.append((node_name, storage_id, s.get("type", "")))
+    return tasks
+
+
+def fetch_storage_status(cluster_name, node_name, storage_id, stype):
+    try:
+        st_status = pve_get(
+            f"/nodes/{node_name}/storage/{storage_id}/status", cache=False
+        )
+    except PveError as e:
+        sys.stderr.write(
+            f"Warning: cannot get storage status for {node_name}/{storage_id}: {e}\n"
+        )
+        return None
+    if not st_status:
+        return None
+    total_b = st_status.get("total", 0) or 0
+    used_b = st_status.get("used", 0) or 0
+    avail_b = st_status.get("avail", 0) or 0
+    total_mb = int(total_b // (1024 * 1024)) if total_b else 0
+    used_mb = int(used_b // (1024 * 1024)) if used_b else 0
+    avail_mb = int(avail_b // (1024 * 1024)) if avail_b else 0
+    if total_mb > 0:
+        used_pct = (used_mb * 100.0) / total_mb
+        avail_pct = 100.0 - used_pct
+    else:
+        used_pct = 0.0
+        avail_pct = 0.0
+    return {
+        "cluster": cluster_name,
+        "node": node_name,
+        "storage": storage_id,
+        "type": stype,
+        "total_MB": total_mb,
+        "used_MB": used_mb,
+        "available_MB": avail_mb,
+        "used_%": f"{used_pct:.2f}",
+        "available_%": f"{avail_pct:.2f}",
+    }
+
+
+@functools.lru_cache(maxsize=4)
 def parse_corosync_conf(path="/etc/corosync/corosync.conf"):
+    cluster_name = None
+    nodes = {}
+    current_node_name = None
     try:
         with open(path, "r") as f:
-            lines = f.readlines()
+            for line in f:
+                stripped = line.strip()
+                if not stripped or stripped[0] == "#":
+                    continue
+                key, sep, val = stripped.partition(":")
+                if not sep:
+                    continue
+                if key == "cluster_name":
+                    cluster_name = val.strip()
+                elif key == "name":
+                    current_node_name = val.strip()
+                elif key == "ring0_addr":
+                    if current_node_name:
+                        nodes[current_node_name] = val.strip()
     except FileNotFoundError:
         return None
     except OSError as e:
         sys.stderr.write(f"Warning: cannot read {path}: {e}\n")
         return None
-    cluster_name = None
-    nodes = {}
-    current_node_name = None
-    for line in lines:
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#"):
-            continue
-        if stripped.startswith("cluster_name:"):
-            _, val = stripped.split(":", 1)
-            cluster_name = val.strip()
-            continue
-        if stripped.startswith("name:"):
-            _, val = stripped.split(":", 1)
-            current_node_name = val.strip()
-            continue
-        if stripped.startswith("ring0_addr:"):
-            _, val = stripped.split(":", 1)
-            addr = val.strip()
-            if current_node_name:
-                nodes[current_node_name] = addr
-            continue
     return {
         "cluster_name": cluster_name,
         "nodes": nodes,
@@ -246,12 +509,10 @@ def is_private_ip(ip_str):
 
 def get_node_external_info(node):
     try:
-        net_info = run_pvesh(
-            ["get", f"/nodes/{node}/network", "--output-format", "json"]
-        )
-    except subprocess.CalledProcessError as e:
+        net_info = pve_get(f"/nodes/{node}/network")
+    except PveError as e:
         sys.stderr.write(
-            f"Warning: cannot get network info for node {node}: {e.stderr}\n"
+            f"Warning: cannot get network info for node {node}: {e}\n"
         )
         return (None, None, None)
     except Exception as e:
@@ -265,22 +526,20 @@ def get_node_external_info(node):
     for iface in net_info:
         if not iface.get("active"):
             continue
-        families = iface.get("families") or []
-        if "inet" not in families:
+        if "inet" not in (iface.get("families") or ()):
             continue
         addr = iface.get("address")
-        cidr = iface.get("cidr")
         gw = iface.get("gateway")
         if not addr or not gw:
             continue
-        candidate = (addr, cidr, gw)
-        if best is None:
-            best = candidate
-        else:
-            best_ip = best[0]
-            cand_ip = addr
-            if is_private_ip(best_ip) and not is_private_ip(cand_ip):
-                best = candidate
+        # The first usable address wins unless it is private and a public
+        # one shows up later; once a public address is picked nothing can
+        # replace it.
+        private = is_private_ip(addr)
+        if best is None or not private:
+            best = (addr, iface.get("cidr"), gw)
+            if not private:
+                break
     if best is None:
         return (None, None, None)
     return best
@@ -358,9 +617,64 @@ def main():
     parser.add_argument(
         "--workers",
         type=int,
-        help="Number of parallel workers for pvesh calls (default: up to 8)",
+        help="Number of parallel workers for pvesh calls (default: up to 4)",
+    )
+    parser.add_argument(
+        "--use-api",
+        action="store_true",
+        help="Query the Proxmox REST API over HTTPS instead of spawning pvesh",
+    )
+    parser.add_argument(
+        "--api-host",
+        default="localhost",
+        help="API host for --use-api (default: localhost)",
+    )
+    parser.add_argument(
+        "--api-port",
+        type=int,
+        default=8006,
+        help="API port for --use-api (default: 8006)",
+    )
+    parser.add_argument(
+        "--api-token",
+        default=os.environ.get("PVE_API_TOKEN"),
+        help="API token for --use-api as USER@REALM!TOKENID=SECRET "
+        "(default: $PVE_API_TOKEN)",
+    )
+    parser.add_argument(
+        "--api-user",
+        help="Log in as USER@REALM for --use-api instead of using a token "
+        "(password from $PVE_API_PASSWORD or prompted)",
+    )
+    parser.add_argument(
+        "--api-insecure",
+        action="store_true",
+        help="Do not verify the API TLS certificate (self-signed setups)",
     )
     args = parser.parse_args()
+    if args.workers is not None and args.workers <= 0:
+        args.workers = None
+    if args.use_api:
+        if not (args.api_user or args.api_token):
+            parser.error(
+                "--use-api requires --api-user, --api-token or $PVE_API_TOKEN"
+            )
+        global API_CLIENT
+        API_CLIENT = PveApiClient(
+            args.api_host,
+            port=args.api_port,
+            token=None if args.api_user else args.api_token,
+            verify_ssl=not args.api_insecure,
+        )
+        if args.api_user:
+            password = os.environ.get("PVE_API_PASSWORD")
+            if password is None:
+                password = getpass.getpass(f"Password for {args.api_user}: ")
+            try:
+                API_CLIENT.login(args.api_user, password)
+            except PveError as e:
+                print("Error logging in to the API:", e, file=sys.stderr)
+                sys.exit(1)
     vmid_filter = set()
     if args.vmid:
         vmid_filter = {v.strip() for v in args.vmid.split(",") if v.strip()}
@@ -368,13 +682,11 @@ def main():
     if args.node:
         node_filter = {n.strip() for n in args.node.split(",") if n.strip()}
     try:
-        cluster_status = run_pvesh(
-            ["get", "/cluster/status", "--output-format", "json"]
-        )
-    except subprocess.CalledProcessError as e:
+        cluster_status = pve_get("/cluster/status")
+    except PveError as e:
         print(
-            "Error running pvesh /cluster/status:",
-            e.stderr,
+            "Error reading /cluster/status:",
+            e,
             file=sys.stderr,
         )
         sys.exit(1)
@@ -385,13 +697,11 @@ def main():
                 cluster_name = item.get("name", cluster_name)
                 break
     try:
-        vm_info = run_pvesh(
-            ["get", "/cluster/resources", "--type", "vm", "--output-format", "json"]
-        )
-    except subprocess.CalledProcessError as e:
+        vm_info = pve_get("/cluster/resources", type="vm")
+    except PveError as e:
         print(
-            "Error running pvesh /cluster/resources:",
-            e.stderr,
+            "Error reading /cluster/resources:",
+            e,
             file=sys.stderr,
         )
         sys.exit(1)
@@ -400,7 +710,7 @@ def main():
     if args.list_nodes:
         nodes = sorted({vm.get("node") for vm in vm_info if vm.get("node")})
         if args.output == "json":
-            print(json.dumps(nodes, indent=2))
+            print_json(nodes)
             return
         if args.output == "csv":
             for n in nodes:
@@ -415,7 +725,7 @@ def main():
     if args.list_vmids:
         vmids = sorted({str(vm.get("vmid")) for vm in vm_info if vm.get("vmid")})
         if args.output == "json":
-            print(json.dumps(vmids, indent=2))
+            print_json(vmids)
             return
         if args.output == "csv":
             for vid in vmids:
@@ -436,9 +746,9 @@ def main():
             corosync_cluster_name = corosync_data.get("cluster_name")
         cluster_name_ci = corosync_cluster_name or cluster_name or "standalone"
         try:
-            nodes_list = run_pvesh(["get", "/nodes", "--output-format", "json"])
-        except subprocess.CalledProcessError as e:
-            print("Error running pvesh /nodes:", e.stderr, file=sys.stderr)
+            nodes_list = pve_get("/nodes")
+        except PveError as e:
+            print("Error reading /nodes:", e, file=sys.stderr)
             sys.exit(1)
         if not nodes_list:
             nodes_list = []
@@ -462,7 +772,7 @@ def main():
                 "external_gw": ext_gw or "",
             }
             rows_ci.append(row)
-        rows_ci.sort(key=lambda r: r["node"])
+        rows_ci.sort(key=itemgetter("node"))
         headers_ci = [
             "cluster",
             "node",
@@ -472,95 +782,46 @@ def main():
             "external_gw",
         ]
         if args.output == "json":
-            print(json.dumps(rows_ci, indent=2))
+            print_json(rows_ci)
             return
         if args.output == "csv":
-            if not args.no_header:
-                print(";".join(headers_ci))
-            for r in rows_ci:
-                print(";".join(str(r[h]) for h in headers_ci))
+            print_csv(headers_ci, rows_ci, header=not args.no_header)
             return
         if rows_ci or not args.no_header:
             print_table(headers_ci, rows_ci, human=False)
         return
     if args.list_storages:
         try:
-            nodes_list = run_pvesh(["get", "/nodes", "--output-format", "json"])
-        except subprocess.CalledProcessError as e:
-            print("Error running pvesh /nodes:", e.stderr, file=sys.stderr)
+            nodes_list = pve_get("/nodes")
+        except PveError as e:
+            print("Error reading /nodes:", e, file=sys.stderr)
             sys.exit(1)
         if not nodes_list:
             nodes_list = []
-        storage_rows = []
+        node_names = []
         for ninfo in nodes_list:
             node_name = ninfo.get("node")
             if not node_name:
                 continue
             if node_filter and node_name not in node_filter:
                 continue
-            try:
-                stor_list = run_pvesh(
-                    [
-                        "get",
-                        f"/nodes/{node_name}/storage",
-                        "--output-format",
-                        "json",
-                    ]
-                )
-            except subprocess.CalledProcessError as e:
-                sys.stderr.write(
-                    f"Warning: cannot get storage list for node {node_name}: {e.stderr}\n"
-                )
-                continue
-            if not stor_list:
-                continue
-            for s in stor_list:
-                storage_id = s.get("storage")
-                stype = s.get("type", "")
-                if not storage_id:
-                    continue
-                try:
-                    st_status = run_pvesh(
-                        [
-                            "get",
-                            f"/nodes/{node_name}/storage/{storage_id}/status",
-                            "--output-format",
-                            "json",
-                        ]
-                    )
-                except subprocess.CalledProcessError as e:
-                    sys.stderr.write(
-                        f"Warning: cannot get storage status for {node_name}/{storage_id}: {e.stderr}\n"
-                    )
-                    continue
-                if not st_status:
-                    continue
-                total_b = st_status.get("total", 0) or 0
-                used_b = st_status.get("used", 0) or 0
-                avail_b = st_status.get("avail", 0) or 0
-                total_mb = int(total_b // (1024 * 1024)) if total_b else 0
-                used_mb = int(used_b // (1024 * 1024)) if used_b else 0
-                avail_mb = int(avail_b // (1024 * 1024)) if avail_b else 0
-                if total_mb > 0:
-                    used_pct = (used_mb * 100.0) / total_mb
-                    avail_pct = 100.0 - used_pct
-                else:
-                    used_pct = 0.0
-                    avail_pct = 0.0
-                storage_rows.append(
-                    {
-                        "cluster": cluster_name,
-                        "node": node_name,
-                        "storage": storage_id,
-                        "type": stype,
-                        "total_MB": total_mb,
-                        "used_MB": used_mb,
-                        "available_MB": avail_mb,
-                        "used_%": f"{used_pct:.2f}",
-                        "available_%": f"{avail_pct:.2f}",
-                    }
-                )
-        storage_rows.sort(key=lambda r: (r["node"], r["storage"]))
+            node_names.append(node_name)
+        # Pool threads are started lazily, so sizing for the larger
+        # (storage status) phase costs nothing while listing nodes.
+        executor = _get_executor(args.workers or 4)
+        storage_tasks = [
+            task
+            for node_tasks in executor.map(fetch_node_storages, node_names)
+            for task in node_tasks
+        ]
+        storage_rows = [
+            row
+            for row in executor.map(
+                lambda t: fetch_storage_status(cluster_name, *t), storage_tasks
+            )
+            if row
+        ]
+        storage_rows.sort(key=itemgetter("node", "storage"))
         headers_st = [
             "cluster",
             "node",
@@ -573,13 +834,10 @@ def main():
             "available_%",
         ]
         if args.output == "json":
-            print(json.dumps(storage_rows, indent=2))
+            print_json(storage_rows)
             return
         if args.output == "csv":
-            if not args.no_header:
-                print(";".join(headers_st))
-            for r in storage_rows:
-                print(";".join(str(r[h]) for h in headers_st))
+            print_csv(headers_st, storage_rows, header=not args.no_header)
             return
         if storage_rows or not args.no_header:
             print_table(headers_st, storage_rows, human=args.human)
@@ -618,128 +876,58 @@ def main():
         ):
             pass
         sys.exit(0)
-    if args.workers and args.workers > 0:
-        workers = args.workers
-    else:
-        workers = min(8, len(vm_entries))
     rows = []
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_vm = {
-            executor.submit(fetch_vm_disks, cluster_name, vm_entry): vm_entry
-            for vm_entry in vm_entries
-        }
-        for future in as_completed(future_to_vm):
-            vm_entry = future_to_vm[future]
-            try:
-                disk_rows = future.result()
-                rows.extend(disk_rows)
-            except Exception as e:
-                sys.stderr.write(
-                    f"Error processing {vm_entry['type']} {vm_entry['vmid']} on {vm_entry['node']}: {e}\n"
-                )
+    executor = _get_executor(args.workers or min(4, len(vm_entries)))
+    for disk_rows in executor.map(
+        functools.partial(safe_fetch_vm_disks, cluster_name), vm_entries
+    ):
+        rows.extend(disk_rows)
+    # Sorting once here also orders the aggregates below, since sum_by()
+    # keeps groups in first-seen order.
+    rows.sort(key=itemgetter("node", "vmid_int", "storage", "vmdisk"))
     if args.vm_per_storage:
-        vm_stor_totals = defaultdict(int)
-        vm_meta = {}
-        for r in rows:
-            key = (r["node"], r["vmid"], r["vmname"], r["storage"])
-            vm_stor_totals[key] += r["size_mb"]
-            vm_meta[key] = (r["cluster"], r["vmname"])
-        result = []
-        for key, mb in vm_stor_totals.items():
-            node, vmid, vmname, storage = key
-            cluster_val, vmname_val = vm_meta[key]
-            result.append(
-                {
-                    "cluster": cluster_val,
-                    "node": node,
-                    "vmid": vmid,
-                    "vmname": vmname_val,
-                    "storage": storage,
-                    "size_MB": mb,
-                }
-            )
-        result.sort(key=lambda r: (r["node"], int(r["vmid"]), r["storage"]))
+        result = sum_by(
+            rows,
+            ("cluster", "node", "vmid", "vmname", "storage"),
+            ("node", "vmid", "storage"),
+            "size_MB",
+        )
         headers = ["cluster", "node", "vmid", "vmname", "storage", "size_MB"]
         if args.output == "json":
-            print(json.dumps(result, indent=2))
+            print_json(result)
             return
         if args.output == "csv":
-            if not args.no_header:
-                print(";".join(headers))
-            for r in result:
-                print(";".join(str(r[h]) for h in headers))
+            print_csv(headers, result, header=not args.no_header)
             return
         if result or not args.no_header:
             print_table(headers, result, human=args.human)
         return
     if args.total_per_vm:
-        totals = {}
-        for r in rows:
-            vmid = r["vmid"]
-            if vmid not in totals:
-                totals[vmid] = {
-                    "cluster": r["cluster"],
-                    "node": r["node"],
-                    "vmname": r["vmname"],
-                    "total_size_MB": 0,
-                }
-            totals[vmid]["total_size_MB"] += r["size_mb"]
-        result = [
-            {
-                "cluster": v["cluster"],
-                "node": v["node"],
-                "vmid": vmid,
-                "vmname": v["vmname"],
-                "total_size_MB": v["total_size_MB"],
-            }
-            for vmid, v in totals.items()
-        ]
-        result.sort(key=lambda r: (r["node"], int(r["vmid"])))
+        result = sum_by(
+            rows, ("cluster", "node", "vmid", "vmname"), ("vmid",), "total_size_MB"
+        )
         headers = ["cluster", "node", "vmid", "vmname", "total_size_MB"]
         if args.output == "json":
-            print(json.dumps(result, indent=2))
+            print_json(result)
             return
         if args.output == "csv":
-            if not args.no_header:
-                print(";".join(headers))
-            for r in result:
-                print(";".join(str(r[h]) for h in headers))
+            print_csv(headers, result, header=not args.no_header)
             return
         if result or not args.no_header:
             print_table(headers, result, human=args.human)
         return
     if args.total_per_node:
-        totals = defaultdict(int)
-        for r in rows:
-            totals[r["node"]] += r["size_mb"]
-        result = [
-            {
-                "cluster": cluster_name,
-                "node": node,
-                "total_size_MB": mb,
-            }
-            for node, mb in totals.items()
-        ]
-        result.sort(key=lambda r: r["node"])
+        result = sum_by(rows, ("cluster", "node"), ("node",), "total_size_MB")
         headers = ["cluster", "node", "total_size_MB"]
         if args.output == "json":
-            print(json.dumps(result, indent=2))
+            print_json(result)
             return
         if args.output == "csv":
-            if not args.no_header:
-                print(";".join(headers))
-            for r in result:
-                print(";".join(str(r[h]) for h in headers))
+            print_csv(headers, result, header=not args.no_header)
             return
         if result or not args.no_header:
             print_table(headers, result, human=args.human)
         return
-    rows.sort(
-        key=lambda r: (r["node"], int(r["vmid"]), r["storage"], r["vmdisk"])
-    )
-    if args.output == "json":
-        print(json.dumps(rows, indent=2))
-        return
     headers = [
         "cluster",
         "node",
@@ -750,11 +938,11 @@ def main():
         "size",
         "size_mb",
     ]
+    if args.output == "json":
+        print_json([{h: r[h] for h in headers} for r in rows])
+        return
     if args.output == "csv":
-        if not args.no_header:
-            print(";".join(headers))
-        for r in rows:
-            print(";".join(str(r[h]) for h in headers))
+        print_csv(headers, rows, header=not args.no_header)
         return
     if rows or not args.no_header:
         print_table(headers, rows, human=args.human)